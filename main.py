@@ -1,26 +1,24 @@
 from fastapi import FastAPI, File, UploadFile, Form
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, BinaryIO, Tuple, Union
 import re
-import io
-import nltk
 import os
-
-# NLP/model imports
-from transformers import pipeline
-
-# File parsers
-import pdfplumber
-import docx
-import requests
-from bs4 import BeautifulSoup
-
-# Download NLTK data (with error handling for Azure)
-try:
-    nltk.download('punkt', quiet=True)
-except Exception as e:
-    print(f"Warning: Could not download NLTK data: {e}")
+import bisect
+import copy
+import asyncio
+import hashlib
+import shutil
+import tempfile
+import threading
+import anyio
+import ahocorasick
+import blingfire
+import numpy as np
+from cachetools import LRUCache
+
+# Model (torch/transformers) and file parser imports are deferred to the
+# functions that use them so the worker starts and /health answers quickly.
 
 app = FastAPI(title="T&C Summarizer - Upgraded Backend")
 
@@ -42,76 +40,373 @@ app.add_middleware(
 # -----------------------------
 # Configurations
 # -----------------------------
-SUMMARIZER_MODEL = os.getenv("SUMMARIZER_MODEL", "sshleifer/distilbart-cnn-12-6")
-CHUNK_TOKEN_LIMIT = int(os.getenv("CHUNK_TOKEN_LIMIT", "700"))  # approx words per chunk
+SUMMARIZER_MODEL = os.getenv("SUMMARIZER_MODEL", "sshleifer/distilbart-cnn-6-6")
+# comma-separated models tried in order if SUMMARIZER_MODEL fails to load
+SUMMARIZER_FALLBACK = [m.strip() for m in os.getenv("SUMMARIZER_FALLBACK", "sshleifer/distilbart-cnn-12-6").split(",") if m.strip()]
+CHUNK_TOKEN_LIMIT = int(os.getenv("CHUNK_TOKEN_LIMIT", "700"))  # approx words per chunk (no model loaded)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "900"))  # model tokens per chunk, below BART's 1024 limit
+SUMMARIZER_BATCH_SIZE = int(os.getenv("SUMM_BATCH", "4"))  # chunks per forward pass
+SUMMARIZER_MAX_BATCH = int(os.getenv("SUMM_MAX_BATCH", "16"))  # chunks per pipeline call, across requests
+SUMMARIZER_BATCH_DELAY_MS = int(os.getenv("SUMM_BATCH_DELAY_MS", "20"))  # wait for more chunks to join a batch
+SUMMARIZER_MIN_WORDS = int(os.getenv("SUMMARIZER_MIN_WORDS", "200"))  # shorter inputs are returned as-is
+SUMMARIZER_BACKEND = os.getenv("SUMMARIZER_BACKEND", "onnx")  # "onnx" (quantized) or "pytorch"
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", "/tmp/tncs-onnx")  # exported models survive restarts
 PORT = int(os.getenv("PORT", 8000))  # Azure sets this automatically
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))  # worker processes sharing the CPU
+WORKER_THREADS = max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)  # intra-op threads per worker
+PRELOAD_MODEL = os.getenv("PRELOAD_MODEL", "0") == "1"  # load at import, e.g. in the gunicorn --preload master
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "256"))  # cached responses per worker
+
+# ONNX graphs produced by the seq2seq export, each quantized separately
+ONNX_FILES = ("encoder_model", "decoder_model", "decoder_with_past_model")
+
+
+def onnx_quantized_files() -> Dict[str, str]:
+    return {name: f"{name}_quantized.onnx" for name in ONNX_FILES}
+
+
+def export_onnx_model(model_name: str) -> str:
+    # optional dependency, only needed for the ONNX Runtime backend
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    model_dir = os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "--"))
+    if os.path.isdir(model_dir):
+        # the directory only ever appears fully built (see os.replace below)
+        if all(os.path.exists(os.path.join(model_dir, f)) for f in onnx_quantized_files().values()):
+            return model_dir
+        # left over from an in-place export that never finished
+        shutil.rmtree(model_dir, ignore_errors=True)
+
+    # export + INT8 dynamic quantization only happens on the first cold start
+    print(f"⏳ Exporting {model_name} to ONNX (cached in {model_dir})")
+    os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+    # build in a private temp dir so a killed start or a concurrent worker never sees partial files
+    tmp_dir = tempfile.mkdtemp(prefix=".export-", dir=ONNX_CACHE_DIR)
+    try:
+        ort_model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+        ort_model.save_pretrained(tmp_dir)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(tmp_dir)
+        qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+        for name in ONNX_FILES:
+            quantizer = ORTQuantizer.from_pretrained(tmp_dir, file_name=f"{name}.onnx")
+            quantizer.quantize(save_dir=tmp_dir, quantization_config=qconfig)
+        try:
+            os.replace(tmp_dir, model_dir)
+        except OSError:
+            # another worker finished first; keep its copy
+            if not os.path.isdir(model_dir):
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return model_dir
+
+
+def load_onnx_summarizer(model_name: str):
+    import onnxruntime as ort
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import AutoTokenizer, pipeline
+
+    model_dir = export_onnx_model(model_name)
+    quantized = onnx_quantized_files()
+    # ONNX Runtime ignores torch's thread settings; split cores between workers here too
+    session_options = ort.SessionOptions()
+    session_options.intra_op_num_threads = WORKER_THREADS
+    session_options.inter_op_num_threads = 1
+    ort_model = ORTModelForSeq2SeqLM.from_pretrained(
+        model_dir,
+        encoder_file_name=quantized["encoder_model"],
+        decoder_file_name=quantized["decoder_model"],
+        decoder_with_past_file_name=quantized["decoder_with_past_model"],
+        session_options=session_options,
+    )
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    return pipeline("summarization", model=ort_model, tokenizer=tokenizer)
+
+
+def load_summarizer(model_name: str):
+    from transformers import pipeline
+
+    if SUMMARIZER_BACKEND == "onnx":
+        try:
+            return load_onnx_summarizer(model_name)
+        except Exception as e:
+            print(f"⚠️ Warning: ONNX Runtime backend unavailable, using PyTorch: {e}")
+    summ = pipeline("summarization", model=model_name, device=-1)  # Use CPU by default
+    try:
+        # fused attention kernels for the PyTorch model
+        from optimum.bettertransformer import BetterTransformer
+        summ.model = BetterTransformer.transform(summ.model, keep_original_model=False)
+    except Exception as e:
+        print(f"⚠️ Warning: BetterTransformer not applied: {e}")
+    return summ
+
+
+# model is loaded lazily, once per worker (this may take time)
+summarizer = None
+summarizer_ready = False  # loading finished, even if it fell back to truncation
+loaded_model = None
+_summarizer_lock = threading.Lock()
+# private tokenizer for chunking: fast tokenizers keep truncation/padding as shared state,
+# so the pipeline's copy must never be called from another thread
+chunk_tokenizer = None
+_chunk_tokenizer_lock = threading.Lock()
+
+
+def get_summarizer():
+    global summarizer, summarizer_ready, loaded_model, chunk_tokenizer
+    if summarizer_ready:
+        return summarizer
+    with _summarizer_lock:
+        if summarizer_ready:
+            return summarizer
+        try:
+            import torch
 
-# instantiate model (this may take time)
-try:
-    summarizer = pipeline("summarization", model=SUMMARIZER_MODEL, device=-1)  # Use CPU by default
-    print(f"✅ Summarization model loaded: {SUMMARIZER_MODEL}")
-except Exception as e:
-    print(f"⚠️ Warning: Failed to initialize summarization pipeline: {e}")
-    print("⚠️ Falling back to text truncation method")
-    summarizer = None
+            # split cores between workers; a single inter-op thread avoids oversubscription
+            torch.set_num_threads(WORKER_THREADS)
+            torch.set_num_interop_threads(1)
+        except Exception as e:
+            print(f"⚠️ Warning: Could not configure torch threads: {e}")
+
+        for model_name in [SUMMARIZER_MODEL] + [m for m in SUMMARIZER_FALLBACK if m != SUMMARIZER_MODEL]:
+            try:
+                summarizer = load_summarizer(model_name)
+                loaded_model = model_name
+                try:
+                    chunk_tokenizer = copy.deepcopy(summarizer.tokenizer)
+                except Exception as e:
+                    print(f"⚠️ Warning: Could not copy tokenizer, chunking by words: {e}")
+                print(f"✅ Summarization model loaded: {model_name}")
+                break
+            except Exception as e:
+                print(f"⚠️ Warning: Failed to initialize summarization pipeline for {model_name}: {e}")
+        if summarizer is None:
+            print("⚠️ Falling back to text truncation method")
+        summarizer_ready = True
+    return summarizer
+
+
+def preload_summarizer():
+    # gunicorn --preload imports the app once in the master, before forking workers;
+    # only PyTorch weights are worth loading there, since they are shared copy-on-write.
+    # ONNX Runtime sessions do not survive fork, and exporting in the master would keep
+    # the port closed, so the onnx backend is left to the background warmup instead.
+    if SUMMARIZER_BACKEND == "pytorch":
+        get_summarizer()
+
+
+if PRELOAD_MODEL:
+    preload_summarizer()
 
 # -----------------------------
 # Utilities: file parsing
 # -----------------------------
 
-def extract_text_from_pdf_bytes(b: bytes) -> str:
+# PDFium is not thread-safe, even across separate documents
+_pdfium_lock = threading.Lock()
+
+
+def extract_text_from_pdf(f: BinaryIO) -> str:
+    import pypdfium2 as pdfium
+
     text_parts = []
-    with pdfplumber.open(io.BytesIO(b)) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(page_text)
+    with _pdfium_lock:
+        # PDFium reads pages from the file handle on demand instead of a bytes copy
+        pdf = pdfium.PdfDocument(f)
+        try:
+            for page in pdf:
+                page_text = page.get_textpage().get_text_range()
+                if page_text:
+                    text_parts.append(page_text)
+        finally:
+            pdf.close()
     return "\n".join(text_parts)
 
 
-def extract_text_from_docx_bytes(b: bytes) -> str:
-    doc = docx.Document(io.BytesIO(b))
+def extract_text_from_docx(f: BinaryIO) -> str:
+    import docx
+
+    doc = docx.Document(f)
     paragraphs = [p.text for p in doc.paragraphs if p.text and p.text.strip()]
     return "\n".join(paragraphs)
 
 
-def fetch_text_from_url(url: str) -> str:
-    r = requests.get(url, timeout=10)
-    soup = BeautifulSoup(r.text, "html.parser")
+def extract_text_from_html(html: str) -> str:
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
     # naive extraction: join all paragraphs
-    paragraphs = [p.get_text(separator=" ") for p in soup.find_all('p')]
+    paragraphs = [p.text(separator=" ") for p in tree.css("p")]
     return "\n".join(paragraphs)
 
+
+# shared client so repeated fetches reuse pooled HTTP/2 connections
+_http_client = None
+
+
+def get_http_client():
+    global _http_client
+    if _http_client is None:
+        import httpx
+
+        _http_client = httpx.AsyncClient(http2=True, timeout=10, follow_redirects=True)
+    return _http_client
+
+
+async def fetch_text_from_url(url: str) -> str:
+    r = await get_http_client().get(url)
+    # parsing a large page is CPU-bound; keep it off the event loop
+    return await anyio.to_thread.run_sync(extract_text_from_html, r.text)
+
 # -----------------------------
 # Text cleaning and chunking
 # -----------------------------
 
+# any whitespace run (including \r and newlines) collapses to one space
+WHITESPACE_RE = re.compile(r"\s+")
+
+
 def clean_text(text: str) -> str:
-    text = re.sub(r"\r", "\n", text)
-    text = re.sub(r"\n{2,}", "\n\n", text)
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
+    return WHITESPACE_RE.sub(" ", text).strip()
+
+
+def split_sentences(text: str) -> List[str]:
+    # blingfire's finite-state splitter, one sentence per line
+    return [s for s in blingfire.text_to_sentences(text).split("\n") if s]
+
+
+def chunk_boundaries(lengths: np.ndarray, limit: int) -> List[int]:
+    # greedy packing: each chunk takes sentences until the next would exceed `limit`
+    cs = np.cumsum(lengths)
+    bounds = [0]
+    while bounds[-1] < len(lengths):
+        start = bounds[-1]
+        base = cs[start - 1] if start else 0
+        end = int(np.searchsorted(cs, base + limit, side='right'))
+        bounds.append(max(end, start + 1))  # an oversized sentence is its own chunk
+    return bounds
 
 
 def chunk_text(text: str, max_words: int = CHUNK_TOKEN_LIMIT) -> List[str]:
-    sentences = nltk.sent_tokenize(text)
-    chunks = []
-    current = []
-    current_len = 0
-
-    for s in sentences:
-        words = len(s.split())
-        if current_len + words <= max_words:
-            current.append(s)
-            current_len += words
-        else:
-            if current:
-                chunks.append(" ".join(current))
-            current = [s]
-            current_len = words
-    if current:
-        chunks.append(" ".join(current))
-    return chunks
+    sentences = split_sentences(text)
+    # text is whitespace-normalized, so words = spaces + 1
+    lengths = np.fromiter((s.count(' ') + 1 for s in sentences), dtype=np.int64, count=len(sentences))
+    bounds = chunk_boundaries(lengths, max_words)
+    return [" ".join(sentences[a:b]) for a, b in zip(bounds, bounds[1:])]
+
+
+def chunk_text_by_tokens(text: str, tokenizer, max_tokens: int = CHUNK_MAX_TOKENS) -> List[str]:
+    # pack sentences by real model token counts so chunks are never truncated by the pipeline
+    max_tokens = min(max_tokens, tokenizer.model_max_length - 2)  # room for special tokens
+    sentences = split_sentences(text)
+    enc = tokenizer(sentences, add_special_tokens=False, return_offsets_mapping=True)
+
+    pieces = []
+    lengths = []
+    for s, ids, offs in zip(sentences, enc["input_ids"], enc["offset_mapping"]):
+        if len(ids) <= max_tokens:
+            pieces.append(s)
+            lengths.append(len(ids))
+            continue
+        # a single oversized sentence is cut at token offsets
+        for i in range(0, len(ids), max_tokens):
+            window = offs[i:i + max_tokens]
+            pieces.append(s[window[0][0]:window[-1][1]].strip())
+            lengths.append(len(window))
+
+    bounds = chunk_boundaries(np.asarray(lengths, dtype=np.int64), max_tokens)
+    return [" ".join(pieces[a:b]) for a, b in zip(bounds, bounds[1:])]
+
+# -----------------------------
+# Summarization
+# -----------------------------
+
+def truncate_chunk(c: str, max_words: int = 120) -> str:
+    words = c.split()
+    return ' '.join(words[:max_words]) + ('...' if len(words) > max_words else '')
+
+
+def summarize_chunks(chunks: List[str]) -> Tuple[List[str], bool]:
+    # returns the summaries and whether the model produced them (False: truncation fallback)
+    summarizer = get_summarizer()
+    if not summarizer or not chunks:
+        # No AI model available, use simple truncation
+        return [truncate_chunk(c) for c in chunks], False
+
+    # boilerplate repeated verbatim is summarized once and re-expanded afterwards
+    unique: Dict[str, int] = {}
+    slots = [unique.setdefault(c, len(unique)) for c in chunks]
+    unique_chunks = list(unique)
+
+    # sort by length so each batch pads to a similar size, then restore order
+    order = sorted(range(len(unique_chunks)), key=lambda i: len(unique_chunks[i]))
+    import torch
+
+    try:
+        # Use AI model for summarization, one pipeline call for all chunks
+        with torch.inference_mode():
+            outs = summarizer(
+                [unique_chunks[i] for i in order],
+                max_length=150,
+                min_length=30,
+                do_sample=False,
+                batch_size=SUMMARIZER_BATCH_SIZE,
+                truncation=True,
+            )
+    except Exception as e:
+        print(f"⚠️ AI summarization failed for {len(chunks)} chunks: {e}")
+        # fallback: simple truncation
+        return [truncate_chunk(c) for c in chunks], False
+
+    unique_summaries = [""] * len(unique_chunks)
+    for i, o in zip(order, outs):
+        unique_summaries[i] = o['summary_text']
+    return [unique_summaries[slot] for slot in slots], True
+
+
+# dynamic micro-batching: chunks from concurrent requests share one pipeline call
+_pending: Optional[asyncio.Queue] = None
+_batcher_task = None
+
+
+async def _batch_worker():
+    loop = asyncio.get_running_loop()
+    while True:
+        items = [await _pending.get()]
+        deadline = loop.time() + SUMMARIZER_BATCH_DELAY_MS / 1000
+        while len(items) < SUMMARIZER_MAX_BATCH:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(_pending.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        try:
+            summaries, used_model = await asyncio.to_thread(summarize_chunks, [c for c, _ in items])
+        except Exception as e:
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(e)
+            continue
+        for (_, fut), summary in zip(items, summaries):
+            if not fut.done():
+                fut.set_result((summary, used_model))
+
+
+async def summarize_chunks_batched(chunks: List[str]) -> Tuple[List[str], bool]:
+    # returns the summaries and whether the model produced all of them
+    loop = asyncio.get_running_loop()
+    unique = list(dict.fromkeys(chunks))
+    futures = {}
+    for c in unique:
+        futures[c] = loop.create_future()
+        _pending.put_nowait((c, futures[c]))
+    results = dict(zip(unique, await asyncio.gather(*futures.values())))
+    return [results[c][0] for c in chunks], all(used for _, used in results.values())
 
 # -----------------------------
 # Clause classification & risk scoring (rule-based)
@@ -138,32 +433,47 @@ RISK_KEYWORDS = {
 }
 
 
-def classify_clauses(text: str) -> Dict[str, List[str]]:
-    matches = {k: [] for k in CLAUSE_KEYWORDS.keys()}
-    lower = text.lower()
+def build_automaton(entries: Dict[str, Any]) -> ahocorasick.Automaton:
+    automaton = ahocorasick.Automaton()
+    for kw, payload in entries.items():
+        automaton.add_word(kw, payload)
+    automaton.make_automaton()
+    return automaton
+
 
+# keyword -> labels it votes for (a keyword may belong to several labels)
+_clause_labels: Dict[str, List[str]] = {}
+for _label, _kw_list in CLAUSE_KEYWORDS.items():
+    for _kw in _kw_list:
+        _clause_labels.setdefault(_kw, []).append(_label)
+
+CLAUSE_AUTOMATON = build_automaton(_clause_labels)
+RISK_AUTOMATON = build_automaton({kw: kw for kw in RISK_KEYWORDS})
+
+
+def classify_clauses(text: str) -> Dict[str, List[str]]:
     # scan paragraph-wise for likely matches
-    paragraphs = [p.strip() for p in re.split(r"\n{1,}", text) if p.strip()]
-    for p in paragraphs:
-        pl = p.lower()
-        for label, kw_list in CLAUSE_KEYWORDS.items():
-            for kw in kw_list:
-                if kw in pl:
-                    if len(matches[label]) < 10:  # cap per label
-                        matches[label].append(p.strip())
-                    break
-    # remove empty lists
-    return {k: v for k, v in matches.items() if v}
+    paragraphs = [p for p in (line.strip() for line in text.splitlines()) if p]
+    lowered = [p.lower() for p in paragraphs]
+
+    # one pass over all paragraphs; map each hit back via paragraph start offsets
+    starts = [0]
+    for pl in lowered[:-1]:
+        starts.append(starts[-1] + len(pl) + 1)
+    hits = {k: set() for k in CLAUSE_KEYWORDS.keys()}
+    for end_idx, labels in CLAUSE_AUTOMATON.iter("\n".join(lowered)):
+        i = bisect.bisect_right(starts, end_idx) - 1
+        for label in labels:
+            hits[label].add(i)
+
+    # keep document order, cap per label, and remove empty lists
+    return {k: [paragraphs[i] for i in sorted(v)[:10]] for k, v in hits.items() if v}
 
 
 def compute_risk_score(text: str) -> Dict[str, Any]:
-    score = 0
-    found = []
-    lower = text.lower()
-    for kw, w in RISK_KEYWORDS.items():
-        if kw in lower:
-            score += w
-            found.append(kw)
+    hit = {kw for _, kw in RISK_AUTOMATON.iter(text.lower())}
+    found = [kw for kw in RISK_KEYWORDS if kw in hit]
+    score = sum(RISK_KEYWORDS[kw] for kw in found)
     # normalize to low/medium/high
     if score >= 6:
         level = "high"
@@ -187,69 +497,102 @@ class SummaryResponse(BaseModel):
     raw_extracted: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
 
+# -----------------------------
+# Response cache
+# -----------------------------
+
+# (loaded model, content hash) -> SummaryResponse; only touched from the event loop
+summary_cache: LRUCache = LRUCache(maxsize=SUMMARY_CACHE_SIZE)
+cache_stats = {"hits": 0, "misses": 0}
+
+
+def summary_cache_key(kind: str, payload: Union[bytes, BinaryIO]) -> str:
+    # content digest only; lookups pair it with the model that is actually loaded
+    h = hashlib.blake2b(digest_size=16)
+    h.update(kind.encode() + b"\0")
+    if isinstance(payload, bytes):
+        h.update(payload)
+    else:
+        # hash uploads block by block so they are never held in memory whole
+        payload.seek(0)
+        for block in iter(lambda: payload.read(1 << 20), b""):
+            h.update(block)
+        payload.seek(0)
+    return h.hexdigest()
+
+
+def cached_response(response: SummaryResponse, filename: str, include_raw: bool) -> SummaryResponse:
+    # cached entries always keep the raw text; trim it per request
+    return response.model_copy(update={
+        "title": filename,
+        "raw_extracted": response.raw_extracted if include_raw else None,
+    })
+
 # -----------------------------
 # API endpoints
 # -----------------------------
 
-@app.post("/summarizer", response_model=SummaryResponse)
-async def summarize(
-    file: Optional[UploadFile] = File(None),
-    url: Optional[str] = Form(None),
-    text_body: Optional[str] = Form(None),
-    include_raw: Optional[bool] = Form(False),
-):
-    """
-    Accepts one of: file upload (txt/pdf/docx), url, or raw text in `text_body`.
-    Returns structured summary JSON.
-    """
-    print(f"📄 Processing request - File: {file.filename if file else 'None'}, URL: {url}, Text length: {len(text_body) if text_body else 0}")
+_warmup_task = None
 
-    if not any([file, url, text_body]):
-        return SummaryResponse(
-            title="",
-            summary="",
-            keyPoints=[],
-            riskLevel="low",
-            readingTime="0",
-            importantClauses=[],
-            raw_extracted=None,
-            metadata={"error": "No input provided. Send a file, url, or text_body."}
-        )
 
-    extracted = ""
-    filename = ""
+@app.on_event("startup")
+async def warm_summarizer():
+    # load in the background so /health responds before the model is ready
+    global _warmup_task
+    _warmup_task = asyncio.create_task(asyncio.to_thread(get_summarizer))
 
-    # 1) File upload
-    if file:
-        filename = file.filename
-        content = await file.read()
-        lower_name = filename.lower()
-        try:
-            if lower_name.endswith('.pdf'):
-                extracted = extract_text_from_pdf_bytes(content)
-            elif lower_name.endswith('.docx'):
-                extracted = extract_text_from_docx_bytes(content)
-            else:
-                # assume plain text
-                extracted = content.decode('utf-8', errors='ignore')
-        except Exception as e:
-            extracted = content.decode('utf-8', errors='ignore')
 
-    # 2) URL
-    elif url:
-        filename = url
-        try:
-            extracted = fetch_text_from_url(url)
-        except Exception as e:
-            extracted = f"""Failed to fetch URL: {e}"""
+@app.on_event("startup")
+async def start_batcher():
+    global _pending, _batcher_task
+    _pending = asyncio.Queue()
+    _batcher_task = asyncio.create_task(_batch_worker())
+
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    if _batcher_task is not None:
+        _batcher_task.cancel()
 
-    # 3) Raw text
-    elif text_body:
-        filename = "pasted_text"
-        extracted = text_body
 
+def extract_text_from_upload(filename: str, f: BinaryIO) -> str:
+    lower_name = filename.lower()
+    f.seek(0)
+    try:
+        if lower_name.endswith('.pdf'):
+            return extract_text_from_pdf(f)
+        elif lower_name.endswith('.docx'):
+            return extract_text_from_docx(f)
+        else:
+            # assume plain text
+            return f.read().decode('utf-8', errors='ignore')
+    except Exception as e:
+        f.seek(0)
+        return f.read().decode('utf-8', errors='ignore')
+
+
+def _prepare(extracted: str) -> Tuple[str, List[str], bool]:
+    # blocking CPU work, run off the event loop
     cleaned = clean_text(extracted)
+    if not cleaned:
+        return cleaned, [], False
+    # short inputs are already summary-sized: skip chunking and the model
+    if len(cleaned.split()) < SUMMARIZER_MIN_WORDS:
+        return cleaned, [cleaned], False
+    get_summarizer()
+    if chunk_tokenizer is not None:
+        try:
+            with _chunk_tokenizer_lock:
+                chunks = chunk_text_by_tokens(cleaned, chunk_tokenizer)
+            return cleaned, chunks, True
+        except Exception as e:
+            # e.g. slow tokenizers without offset mapping
+            print(f"⚠️ Token-based chunking failed, chunking by words: {e}")
+    return cleaned, chunk_text(cleaned), True
 
+
+def _assemble(filename: str, cleaned: str, chunks: List[str], chunk_summaries: List[str], summarized_by: str, include_raw: bool) -> SummaryResponse:
+    # blocking CPU work, run off the event loop
     # early short-circuit
     if not cleaned:
         return SummaryResponse(
@@ -263,28 +606,11 @@ async def summarize(
             metadata={"error": "No text extracted from input."}
         )
 
-    # chunk and summarize
-    chunks = chunk_text(cleaned)
-    chunk_summaries = []
-    for i, c in enumerate(chunks):
-        if summarizer:
-            try:
-                # Use AI model for summarization
-                s = summarizer(c, max_length=150, min_length=30, do_sample=False)[0]['summary_text']
-            except Exception as e:
-                print(f"⚠️ AI summarization failed for chunk {i}: {e}")
-                # fallback: simple truncation
-                s = ' '.join(c.split()[:120]) + ('...' if len(c.split())>120 else '')
-        else:
-            # No AI model available, use simple truncation
-            s = ' '.join(c.split()[:120]) + ('...' if len(c.split())>120 else '')
-        chunk_summaries.append(s)
-
     # combine chunk summaries into final summary and key points
     final_summary = "\n\n".join(chunk_summaries)
 
     # Produce key points by splitting sentences from the final summary and choosing top N
-    final_sentences = nltk.sent_tokenize(final_summary)
+    final_sentences = split_sentences(final_summary)
     key_points = [s.strip() for s in final_sentences[:8]]
 
     # classify clauses
@@ -315,6 +641,7 @@ async def summarize(
             "word_count": words,
             "risk_details": risk,
             "clauses_found_count": {k: len(v) for k, v in clauses.items()},
+            "summarizer": summarized_by,
         }
     )
 
@@ -322,8 +649,95 @@ async def summarize(
     return response
 
 
+@app.on_event("shutdown")
+async def close_http_client():
+    if _http_client is not None:
+        await _http_client.aclose()
+
+
+@app.post("/summarizer", response_model=SummaryResponse)
+async def summarize(
+    file: Optional[UploadFile] = File(None),
+    url: Optional[str] = Form(None),
+    text_body: Optional[str] = Form(None),
+    include_raw: Optional[bool] = Form(False),
+):
+    """
+    Accepts one of: file upload (txt/pdf/docx), url, or raw text in `text_body`.
+    Returns structured summary JSON.
+    """
+    print(f"📄 Processing request - File: {file.filename if file else 'None'}, URL: {url}, Text length: {len(text_body) if text_body else 0}")
+
+    if not any([file, url, text_body]):
+        return SummaryResponse(
+            title="",
+            summary="",
+            keyPoints=[],
+            riskLevel="low",
+            readingTime="0",
+            importantClauses=[],
+            raw_extracted=None,
+            metadata={"error": "No input provided. Send a file, url, or text_body."}
+        )
+
+    extracted = ""
+    filename = ""
+    key = None
+
+    # 1) File upload
+    if file:
+        filename = file.filename
+        # UploadFile is already spooled to disk past 1 MB; read it in place rather than copying to bytes
+        kind = "file" + os.path.splitext(filename.lower())[1]
+        key = await anyio.to_thread.run_sync(summary_cache_key, kind, file.file)
+
+    # 2) URL
+    elif url:
+        filename = url
+        try:
+            extracted = await fetch_text_from_url(url)
+            key = summary_cache_key("text", extracted.encode())
+        except Exception as e:
+            extracted = f"""Failed to fetch URL: {e}"""
+
+    # 3) Raw text
+    elif text_body:
+        filename = "pasted_text"
+        extracted = text_body
+        key = summary_cache_key("text", extracted.encode())
+
+    cached = summary_cache.get((loaded_model, key)) if key else None
+    if cached is not None:
+        cache_stats["hits"] += 1
+        print(f"⚡ Cache hit for {filename}")
+        return cached_response(cached, filename, include_raw)
+    cache_stats["misses"] += 1
+
+    if file:
+        extracted = await anyio.to_thread.run_sync(extract_text_from_upload, filename, file.file)
+
+    # clean + chunk, summarize through the shared batcher, then classify and score
+    cleaned, chunks, needs_summary = await anyio.to_thread.run_sync(_prepare, extracted)
+    if needs_summary:
+        chunk_summaries, used_model = await summarize_chunks_batched(chunks)
+        summarized_by = loaded_model if used_model else "truncation"
+    else:
+        chunk_summaries, used_model = chunks, True
+        summarized_by = "skipped"  # short input returned as-is
+    response = await anyio.to_thread.run_sync(_assemble, filename, cleaned, chunks, chunk_summaries, summarized_by, True)
+    # never cache a truncation fallback: a transient model failure must not stick to the content hash
+    if key and used_model:
+        summary_cache[(loaded_model, key)] = response
+    return cached_response(response, filename, include_raw)
+
+
 @app.get("/health")
 async def health():
-    return {"status": "ok", "model": SUMMARIZER_MODEL}
+    return {
+        "status": "ok",
+        "model": loaded_model or SUMMARIZER_MODEL,
+        "model_ready": summarizer_ready,
+        "cache": {**cache_stats, "size": len(summary_cache)},
+    }
 
 # End of file